@@ -11,130 +11,224 @@ Use --negative to invert the output (negative image) and flip the image left-rig
 import argparse
 import colorsys
 import csv
+import functools
+import os
+import queue
 import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 
+import numpy as np
 from PIL import Image
 
 
-def load_lut(csv_path: Path) -> list[int]:
-    """Load a 256-entry LUT from a CSV with 'Scan' (input) and 'Idea' (output). Uses linear interpolation."""
+def load_lut(csv_path: Path) -> bytes:
+    """Load a 256-entry LUT (one byte per input level) from a CSV with 'Scan' (input) and 'Idea' (output). Uses linear interpolation."""
     with open(csv_path, newline="", encoding="utf-8") as f:
-        sample = f.read(4096)
-    f = open(csv_path, newline="", encoding="utf-8")
-    try:
-        try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=",\t")
-        except csv.Error:
-            dialect = csv.excel_tab
-        reader = csv.DictReader(f, dialect=dialect)
-        if reader.fieldnames is None or "Idea" not in reader.fieldnames or "Scan" not in reader.fieldnames:
+        # Fixed two-column schema: take the delimiter from the header line (tab if present, else comma)
+        delimiter = "\t" if "\t" in f.readline() else ","
+        f.seek(0)
+        # skipinitialspace: accept a space after the delimiter ("Scan, Idea"), as the sniffed dialect did
+        reader = csv.reader(f, delimiter=delimiter, skipinitialspace=True)
+        header = next(reader, None)
+        if header is None or "Idea" not in header or "Scan" not in header:
             raise ValueError("CSV must have columns 'Idea' and 'Scan'")
-        rows = list(reader)
-    finally:
-        f.close()
+        scan_col, idea_col = header.index("Scan"), header.index("Idea")
+        rows = [row for row in reader if row]
 
-    # Parse (scan=input, idea=output) pairs; clamp idea to [0, 255]
-    pairs: list[tuple[float, float]] = []
-    for row in rows:
-        try:
-            scan = float(row["Scan"].strip())
-            idea = float(row["Idea"].strip())
-        except (ValueError, KeyError) as e:
-            raise ValueError(f"Invalid row in CSV: {row}") from e
-        idea = max(0.0, min(255.0, idea))
-        pairs.append((scan, idea))
-
-    if not pairs:
+    if not rows:
         raise ValueError("CSV has no data rows")
 
-    pairs.sort(key=lambda p: p[0])
-    s_min, o_first = pairs[0][0], pairs[0][1]
-    s_max, o_last = pairs[-1][0], pairs[-1][1]
-
-    # For each integer input i in 0..255, interpolate output
-    lut: list[int] = []
-    for i in range(256):
-        if i <= s_min:
-            out_val = o_first
-        elif i >= s_max:
-            out_val = o_last
-        elif len(pairs) == 1:
-            out_val = o_first
-        else:
-            # Find consecutive (s0, o0) and (s1, o1) such that s0 <= i <= s1
-            for j in range(1, len(pairs)):
-                s0, o0 = pairs[j - 1][0], pairs[j - 1][1]
-                s1, o1 = pairs[j][0], pairs[j][1]
-                if s1 >= i:
-                    if s1 == s0:
-                        out_val = o0
-                    else:
-                        out_val = o0 + (o1 - o0) * (i - s0) / (s1 - s0)
-                    break
-            else:
-                out_val = o_last
-        out_val = max(0.0, min(255.0, out_val))
-        lut.append(round(out_val))
-    return lut
+    # Parse (scan=input, idea=output) columns straight into arrays; clamp idea to [0, 255]
+    scans = np.empty(len(rows), dtype=np.float64)
+    ideas = np.empty(len(rows), dtype=np.float64)
+    for k, row in enumerate(rows):
+        try:
+            scans[k] = float(row[scan_col].strip())
+            ideas[k] = float(row[idea_col].strip())
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Invalid row in CSV: {dict(zip(header, row))}") from e
+    np.clip(ideas, 0.0, 255.0, out=ideas)
+
+    # Stable sort by Scan, so duplicate Scan values keep their file order
+    order = np.argsort(scans, kind="stable")
+    scans, ideas = scans[order], ideas[order]
+
+    # For each integer input i in 0..255, interpolate output between the first sample with Scan >= i
+    # and its predecessor (s0 < i <= s1), which also decides which of duplicate Scan values is used
+    xs = np.arange(256, dtype=np.float64)
+    j = np.clip(np.searchsorted(scans, xs, side="left"), 1, len(scans) - 1)
+    s0, o0 = scans[j - 1], ideas[j - 1]
+    s1, o1 = scans[j], ideas[j]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inner = o0 + (o1 - o0) * (xs - s0) / (s1 - s0)
+    lut = np.where(xs <= scans[0], ideas[0], np.where(xs >= scans[-1], ideas[-1], inner))
+    return np.rint(np.clip(lut, 0.0, 255.0)).astype(np.uint8).tobytes()
 
 
 def collect_images(input_dir: Path, extensions: set[str]) -> list[Path]:
     """Return paths of files whose suffix (lower) is in extensions (single-level)."""
     paths: list[Path] = []
     ext_lower = {e.lower().lstrip(".") for e in extensions}
-    for p in input_dir.iterdir():
-        if p.is_file() and p.suffix.lower().lstrip(".") in ext_lower:
-            paths.append(p)
+    # scandir's DirEntry.is_file() uses the file type from the directory listing, avoiding a stat() per entry
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if os.path.splitext(entry.name)[1].lower().lstrip(".") in ext_lower and entry.is_file():
+                paths.append(input_dir / entry.name)
     return sorted(paths)
 
 
-def scale_to_full_range(img: Image.Image) -> Image.Image:
-    """Scale pixel values to the full range 0-255 (min -> 0, max -> 255)."""
-    pixels = list(img.get_flattened_data())
-    min_val = min(pixels)
-    max_val = max(pixels)
+def full_range_table(min_val: int, max_val: int) -> np.ndarray:
+    """256-entry uint8 table that scales [min_val, max_val] to the full range 0-255 (min -> 0, max -> 255)."""
+    # Same mapping as ImageOps.autocontrast(img, cutoff=0), but rounded rather than truncated
     if max_val == min_val:
         # Constant image: set all to 0 (or leave unchanged; 0 keeps range [0,255])
-        scaled = [0] * len(pixels)
-    else:
-        scale = 255.0 / (max_val - min_val)
-        scaled = [round((p - min_val) * scale) for p in pixels]
-    out_img = Image.new("L", img.size)
-    out_img.putdata(scaled)
-    return out_img
-
-
-def apply_hsv_tint(img: Image.Image, h: float, s: float, v_scale: float) -> Image.Image:
-    """Convert greyscale image (L) to RGB using fixed H and S; pixel value drives V scaled by v_scale. h,s,v_scale in [0,1]."""
-    pixels = list(img.get_flattened_data())
-    rgb_pixels: list[tuple[int, int, int]] = []
-    for L in pixels:
+        return np.zeros(256, dtype=np.uint8)
+    scale = 255.0 / (max_val - min_val)
+    return np.rint(np.clip((np.arange(256, dtype=np.float64) - min_val) * scale, 0.0, 255.0)).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def hsv_tint_table(h: float, s: float, v_scale: float) -> np.ndarray:
+    """(256, 3) uint8 table mapping grey level L to RGB with fixed H and S; L drives V scaled by v_scale. h,s,v_scale in [0,1]."""
+    table = np.empty((256, 3), dtype=np.uint8)
+    for L in range(256):
         v = (L / 255.0) * v_scale
         r, g, b = colorsys.hsv_to_rgb(h, s, v)
-        rgb_pixels.append((round(r * 255), round(g * 255), round(b * 255)))
-    out = Image.new("RGB", img.size)
-    out.putdata(rgb_pixels)
-    return out
+        table[L] = (round(r * 255), round(g * 255), round(b * 255))
+    # Cached and shared between calls
+    table.flags.writeable = False
+    return table
+
+
+def load_stage(path: Path) -> Image.Image:
+    """Load image and convert to greyscale (L)."""
+    return Image.open(path).convert("L")
 
 
-def process_image(path: Path, lut: list[int], output_dir: Path, flip_left_right: bool = False, hsv: tuple[float, float, float] | None = None) -> None:
-    """Load image, convert to greyscale, scale to 0-255, apply LUT, optionally flip left-right, optionally apply HSV tint, save to output_dir (same filename)."""
-    img = Image.open(path).convert("L")
-    img = scale_to_full_range(img)
-    out = img.point(lut, mode="L")
+def gather_table(table: np.ndarray, arr: np.ndarray, flip_left_right: bool) -> np.ndarray:
+    """Map each pixel of arr (H, W) to its row of table (256, C), giving (H, W, C); optionally flip left-right."""
     if flip_left_right:
-        out = out.transpose(Image.FLIP_LEFT_RIGHT)
+        # Reversed view: the gather writes the flipped result directly
+        arr = arr[:, ::-1]
+    return np.take(table, arr, axis=0)
+
+
+def make_transform(lut: bytes, flip_left_right: bool = False, hsv: tuple[float, float, float] | None = None) -> Callable[[Image.Image], Image.Image]:
+    """Return a function that scales an image to 0-255, applies LUT, optionally flips left-right and optionally applies HSV tint."""
+    # Every step is a per-level mapping. LUT and tint are fixed, so compose them once here; per image
+    # only the scale table changes, and the pixels are touched once with a single gather
+    base = np.frombuffer(lut, dtype=np.uint8)
     if hsv is not None:
-        h, s, v_scale = hsv
-        out = apply_hsv_tint(out, h, s, v_scale)
+        base = hsv_tint_table(*hsv)[base]
+    channels = base.shape[1:]
+    mode = "RGB" if channels else "L"
+    base = base.reshape(256, -1)
+
+    def transform(img: Image.Image) -> Image.Image:
+        arr = np.asarray(img, dtype=np.uint8)
+        out = gather_table(base[full_range_table(*img.getextrema())], arr, flip_left_right)
+        return Image.fromarray(out.reshape(arr.shape + channels), mode)
+
+    return transform
+
+
+def save_stage(img: Image.Image, path: Path, output_dir: Path) -> None:
+    """Save img to output_dir under the input filename."""
     out_path = output_dir / path.name
     # Preserve format: JPG/JPEG -> JPEG, PNG -> PNG
     suffix = path.suffix.lower()
     if suffix in (".jpg", ".jpeg"):
-        out.save(out_path, format="JPEG")
+        img.save(out_path, format="JPEG")
     else:
-        out.save(out_path, format="PNG")
+        img.save(out_path, format="PNG")
+
+
+def process_image(path: Path, lut: bytes, output_dir: Path, flip_left_right: bool = False, hsv: tuple[float, float, float] | None = None) -> None:
+    """Load image, convert to greyscale, scale to 0-255, apply LUT, optionally flip left-right, optionally apply HSV tint, save to output_dir (same filename).
+
+    Single-image entry point kept for callers importing this module; main() uses process_images.
+    """
+    save_stage(make_transform(lut, flip_left_right, hsv)(load_stage(path)), path, output_dir)
+
+
+def process_images(paths: list[Path], lut: bytes, output_dir: Path, flip_left_right: bool = False, hsv: tuple[float, float, float] | None = None, workers: int = 2, writers: int = 2) -> list[tuple[Path, str | None]]:
+    """Process paths as a thread pipeline (reader -> transform workers -> writers) joined by bounded queues, so disk I/O overlaps compute.
+
+    Returns (path, error message or None) for each attempted path, in input order. Reading stops after the first error.
+    """
+    loaded: queue.Queue = queue.Queue(maxsize=2 * workers)
+    transformed: queue.Queue = queue.Queue(maxsize=2 * writers)
+    attempted: list[Path] = []
+    errors: dict[Path, str] = {}
+    failed = threading.Event()
+    # Set on Ctrl-C: queued images are dropped instead of finished
+    interrupted = threading.Event()
+    transform = make_transform(lut, flip_left_right, hsv)
+
+    def fail(path: Path, e: Exception) -> None:
+        errors[path] = str(e)
+        failed.set()
+
+    def reader() -> None:
+        for path in paths:
+            if failed.is_set():
+                break
+            attempted.append(path)
+            try:
+                loaded.put((path, load_stage(path)))
+            except Exception as e:
+                fail(path, e)
+        # One poison pill per transform worker
+        for _ in range(workers):
+            loaded.put(None)
+
+    def transformer() -> None:
+        while (item := loaded.get()) is not None:
+            path, img = item
+            if interrupted.is_set():
+                continue
+            try:
+                transformed.put((path, transform(img)))
+            except Exception as e:
+                fail(path, e)
+
+    def writer() -> None:
+        while (item := transformed.get()) is not None:
+            path, img = item
+            if interrupted.is_set():
+                continue
+            try:
+                save_stage(img, path, output_dir)
+            except Exception as e:
+                fail(path, e)
+
+    # Daemon threads, so a second Ctrl-C during shutdown cannot keep the process alive
+    producers = [threading.Thread(target=reader, daemon=True)] + [threading.Thread(target=transformer, daemon=True) for _ in range(workers)]
+    # Several writers: JPEG/PNG encoding releases the GIL, so saves run in parallel
+    write_threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    for t in producers + write_threads:
+        t.start()
+    try:
+        for t in producers:
+            t.join()
+    except BaseException:
+        interrupted.set()
+        raise
+    finally:
+        # Stop the reader, then let the remaining stages drain the queues and exit
+        failed.set()
+        for t in producers:
+            t.join()
+        # All transform workers are done: stop the writers once they have drained the queue
+        for _ in range(writers):
+            transformed.put(None)
+        for t in write_threads:
+            t.join()
+    return [(path, errors.get(path)) for path in attempted]
 
 
 def main() -> None:
@@ -193,7 +287,8 @@ def main() -> None:
         sys.exit(1)
 
     if args.negative:
-        lut = [255 - v for v in lut]
+        # Byte-wise 255 - v, done in C
+        lut = lut.translate(bytes(range(255, -1, -1)))
 
     hsv_tuple: tuple[float, float, float] | None = None
     if args.hsv is not None:
@@ -225,13 +320,27 @@ def main() -> None:
 
     args.output_dir.mkdir(parents=True, exist_ok=True)
 
-    for path in images:
+    # Images are independent: run small batches through the threaded pipeline across worker processes.
+    # A few images per batch let the pipeline overlap I/O and compute; several batches per process keep
+    # cores busy with mixed image sizes and report progress as batches finish. One core: a single batch inline
+    n_workers = min(len(images), os.cpu_count() or 1)
+    batch_size = len(images) if n_workers == 1 else max(1, min(4, len(images) // (4 * n_workers)))
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    worker = functools.partial(process_images, lut=lut, output_dir=args.output_dir, flip_left_right=args.negative, hsv=hsv_tuple)
+    with ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else nullcontext() as executor:
+        results = executor.map(worker, batches) if executor is not None else map(worker, batches)
         try:
-            process_image(path, lut, args.output_dir, flip_left_right=args.negative, hsv=hsv_tuple)
-            print(path.name)
-        except Exception as e:
-            print(f"Error processing {path}: {e}", file=sys.stderr)
-            sys.exit(1)
+            for batch_results in results:
+                for path, error in batch_results:
+                    if error is not None:
+                        print(f"Error processing {path}: {error}", file=sys.stderr)
+                        sys.exit(1)
+                    print(path.name)
+        except BaseException:
+            # Error or Ctrl-C: do not start batches that are still queued (running ones finish)
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            raise
 
     print(f"Processed {len(images)} image(s) -> {args.output_dir}")
 